@@ -0,0 +1,114 @@
+"""Fake Gemini and ChromaDB backends so SmartHelpCenter can be tested offline."""
+
+import re
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import help_center
+
+
+def fake_embedding(text: str, dim: int = 768) -> np.ndarray:
+    """Bag-of-words embedding: texts sharing words get similar vectors."""
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in re.findall(r"\w+", text.lower()):
+        vector += np.random.default_rng(zlib.crc32(token.encode())).standard_normal(dim)
+    return vector
+
+
+class FakeModels:
+    """Records embed and generate calls; set ``embed_error`` to make embedding fail."""
+
+    def __init__(self):
+        self.embed_calls = []
+        self.generate_calls = []
+        self.embed_error = None
+
+    def embed_content(self, model, contents, config):
+        if self.embed_error is not None:
+            raise self.embed_error
+        self.embed_calls.append((config.task_type, list(contents)))
+        return SimpleNamespace(embeddings=[
+            SimpleNamespace(values=fake_embedding(text, config.output_dimensionality).tolist())
+            for text in contents
+        ])
+
+    def generate_content(self, model, contents):
+        self.generate_calls.append(contents)
+        return SimpleNamespace(text=f"answer #{len(self.generate_calls)}")
+
+
+class FakeCollection:
+    """In-memory stand-in for a ChromaDB collection."""
+
+    def __init__(self, name, metadata=None):
+        self.name = name
+        self.metadata = metadata
+        self.records = {}
+
+    def count(self):
+        return len(self.records)
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        for id_, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.records[id_] = (np.asarray(embedding, dtype=np.float32), document, metadata)
+
+    def get(self, ids=None, include=("documents", "metadatas"), limit=None, offset=0):
+        keys = [id_ for id_ in (self.records if ids is None else ids) if id_ in self.records]
+        keys = keys[offset or 0:][:limit]
+        fields = {"embeddings": 0, "documents": 1, "metadatas": 2}
+        result = {"ids": keys}
+        for field, position in fields.items():
+            result[field] = [self.records[id_][position] for id_ in keys] if field in include else None
+        return result
+
+    def query(self, query_embeddings, n_results, where=None, include=()):
+        keys = [
+            id_ for id_, (_, _, metadata) in self.records.items()
+            if not where or all(metadata.get(field) == value for field, value in where.items())
+        ]
+        result = {"ids": [], "distances": []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            distances = [
+                1.0 - float(self.records[id_][0] @ query)
+                / (np.linalg.norm(self.records[id_][0]) * np.linalg.norm(query))
+                for id_ in keys
+            ]
+            order = np.argsort(distances)[:n_results]
+            result["ids"].append([keys[i] for i in order])
+            result["distances"].append([distances[i] for i in order])
+        return result
+
+    def delete(self, ids):
+        for id_ in ids:
+            self.records.pop(id_, None)
+
+
+class FakeChromaClient:
+    def __init__(self):
+        self.collections = {}
+
+    def get_or_create_collection(self, name, metadata=None):
+        return self.collections.setdefault(name, FakeCollection(name, metadata))
+
+
+@pytest.fixture
+def fake_models(monkeypatch):
+    """Patch the Gemini and ChromaDB clients; returns the fake Gemini models."""
+    models = FakeModels()
+    chroma = FakeChromaClient()
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(help_center.genai, "Client", lambda api_key: SimpleNamespace(models=models))
+    monkeypatch.setattr(help_center.chromadb, "PersistentClient", lambda path: chroma)
+    return models
+
+
+@pytest.fixture
+def make_help_center(fake_models):
+    """Build SmartHelpCenter instances that share the fake backends (like a restart)."""
+    def make(**kwargs):
+        kwargs.setdefault("embedding_cache_path", None)
+        return help_center.SmartHelpCenter(**kwargs)
+    return make
@@ -329,7 +329,8 @@ Download our compliance certificates and policies from Settings > Compliance""",
         
         print(f"\n📚 Related Articles:")
         for article in result['relevant_articles']:
-            print(f"   - {article['title']} (Score: {article['relevance_score']:.2f})")
+            score = article['relevance_score']
+            print(f"   - {article['title']} (Score: {'n/a' if score is None else f'{score:.2f}'})")
         
         print("\n" + "-" * 80)
     
@@ -5,26 +5,563 @@ strategies for documents vs queries to improve retrieval accuracy.
 """
 
 import os
+import re
+import random
+import bisect
+import heapq
+import math
+import hashlib
+import sqlite3
+import threading
+import time
 import numpy as np
-from typing import List, Dict, Optional
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Hashable, Iterator, List, Dict, Optional, Tuple
 import chromadb
 from google import genai
-from google.genai import types
+from google.genai import errors, types
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# Synonyms appended to queries that mention a term
+_QUERY_EXPANSIONS = {
+    "can't": "cannot unable",
+    "doesn't work": "not working broken error fail",
+    "payment": "billing charge subscription invoice",
+    "login": "sign in signin authenticate",
+    "password": "credential passphrase pwd",
+    "export": "download save extract",
+    "delete": "remove erase clear",
+    "create": "make new add",
+    "update": "edit modify change"
+}
+
+# Output dimensionality requested from gemini-embedding-001
+_EMBEDDING_DIM = 768
+
+# Filler words ignored when deciding whether a query is made up only of expansion terms
+_STOPWORDS = frozenset({
+    "a", "an", "and", "are", "can", "do", "does", "for", "help", "how", "i", "in",
+    "is", "it", "me", "my", "of", "on", "or", "please", "the", "to", "what", "why", "with"
+})
+
+# HNSW settings for the help article collection: a denser graph (M) and wider
+# construction/search beams trade a little memory for better recall per hop
+_COLLECTION_METADATA = {
+    "hnsw:space": "cosine",
+    "hnsw:construction_ef": 128,
+    "hnsw:M": 24,
+    "hnsw:search_ef": 100
+}
+
+# Every expansion term in one precompiled pattern, so a query is scanned once.
+# The lookahead reports overlapping matches, like the per-term substring checks.
+_EXPANSION_RE = re.compile(
+    "(?=(" + "|".join(re.escape(term) for term in _QUERY_EXPANSIONS) + "))"
+)
+
+# Paragraph breaks, and sentences ending in punctuation followed by whitespace
+# (so URLs and version numbers like "v2.1" stay in one piece)
+_PARA_RE = re.compile(r'\n\n+')
+_SENT_RE = re.compile(r'\S.*?(?:[.!?]+(?=\s)|\Z)', re.DOTALL)
+
+# Word tokens for keyword search
+_TOKEN_RE = re.compile(r"\w+")
+
+# Support answer prompt, split around the user question and the article context
+_PROMPT_PREFIX = """Based on the following help articles, provide a clear and helpful answer to the user's question.
+        
+User Question: """
+_PROMPT_MIDDLE = """
+
+Relevant Help Articles:
+"""
+_PROMPT_SUFFIX = """
+
+Instructions:
+- Provide a concise, friendly response that directly addresses the user's question
+- Use information from the articles to give specific, actionable steps
+- If the articles don't contain the exact answer, suggest related information that might help
+- Keep the tone helpful and professional
+- Format the response with clear steps if applicable"""
+
+# Maximum characters of each retrieved article included in the prompt
+_MAX_CONTEXT_CHARS = 1500
+
+# Candidates taken from each retriever before reciprocal rank fusion
+_FUSION_CANDIDATES = 50
+
+
+class TTLCache:
+    """A small thread-safe LRU cache whose entries expire after ``ttl`` seconds."""
+    
+    def __init__(self, maxsize: int = 10_000, ttl: float = 3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key``, or ``default`` if missing or expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: Hashable, value: Any):
+        """Store ``value`` under ``key``, evicting the least recently used entries."""
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class EmbeddingCache:
+    """
+    Content-addressed on-disk store of document embeddings.
+    
+    Entries are keyed by a SHA-256 digest of the embedded text, so re-indexing
+    unchanged articles reads their vectors back instead of calling Gemini.
+    """
+    
+    # Stay well below SQLite's limit on bound parameters per statement
+    _MAX_KEYS_PER_QUERY = 500
+    
+    def __init__(self, path: str, dim: int = 768):
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)"
+            )
+            self._conn.commit()
+    
+    @staticmethod
+    def key(text: str, namespace: str = "") -> bytes:
+        """Digest identifying ``text`` embedded under ``namespace`` (model and settings)."""
+        return hashlib.sha256(f"{namespace}\n{text}".encode()).digest()
+    
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        """Return the stored vectors for whichever of ``keys`` are present."""
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), self._MAX_KEYS_PER_QUERY):
+                chunk = keys[i:i + self._MAX_KEYS_PER_QUERY]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk
+                ).fetchall()
+                found.update(rows)
+        return {
+            key: np.frombuffer(vector, dtype=np.float32)
+            for key, vector in found.items()
+            if len(vector) == self.dim * 4
+        }
+    
+    def set_many(self, items: List[Tuple[bytes, np.ndarray]]):
+        """Store vectors under their keys."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items]
+            )
+            self._conn.commit()
+
+
+def quantize_int8(embeddings: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Scalar-quantize float embeddings to int8 with one scale per vector.
+    
+    Args:
+        embeddings: Array of shape (n, dim)
+    
+    Returns:
+        Tuple of (codes, scales) where ``embeddings ≈ codes * scales[:, None]``
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    scales = np.max(np.abs(embeddings), axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.round(embeddings / scales[:, None]).astype(np.int8)
+    return codes, scales
+
+
+def _l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length."""
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+class QuantizedIndex:
+    """
+    In-memory copy of the article embeddings for exact cosine search.
+    
+    gemini-embedding-001 is Matryoshka-trained, so the leading ``prefix_dim``
+    dimensions carry most of the signal: the scan compares only that prefix and
+    the best ``k * rerank_factor`` candidates are reranked on the full vectors.
+    
+    Vectors are L2-normalized once at insert time, so cosine similarity is a
+    plain inner product. Each vector is stored only as ``dim`` int8 codes plus
+    two float32 scales (776 bytes at 768 dimensions, a quarter of float32): the
+    first pass reads the leading ``prefix_dim`` codes, with a per-row scale that
+    also normalizes the prefix, and the rerank reads all of them. The scan runs
+    over blocks of rows, so the temporary float32 copy stays small.
+    """
+    
+    # Rows dequantized at a time during the first pass
+    _SCAN_BLOCK = 4096
+    
+    def __init__(self,
+                 dim: int = 768,
+                 prefix_dim: int = 256,
+                 rerank_factor: int = 10):
+        self.dim = dim
+        self.prefix_dim = min(prefix_dim, dim)
+        self.rerank_factor = rerank_factor
+        self._size = 0
+        self._codes = np.empty((0, dim), dtype=np.int8)
+        self._scales = np.empty(0, dtype=np.float32)
+        self._prefix_scales = np.empty(0, dtype=np.float32)
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def add(self, embeddings: np.ndarray, rows: Optional[List[int]] = None):
+        """
+        Normalize, quantize and store a batch of embeddings.
+        
+        Args:
+            embeddings: Array of shape (n, dim)
+            rows: Distinct rows to write, replacing the vectors already there; rows
+                past the end must directly follow it. Defaults to appending.
+        """
+        vectors = _l2_normalize(np.asarray(embeddings, dtype=np.float32))
+        codes, scales = quantize_int8(vectors)
+        # Scale that turns an inner product with the prefix codes into a cosine
+        prefix_norms = np.linalg.norm(codes[:, :self.prefix_dim].astype(np.float32), axis=1) * scales
+        prefix_scales = scales / np.maximum(prefix_norms, 1e-12)
+        size = self._size
+        rows = np.arange(size, size + len(vectors)) if rows is None else np.asarray(rows, dtype=np.intp)
+        end = max(size, int(rows.max()) + 1) if len(rows) else size
+        
+        # Grow geometrically so repeated batch appends stay linear overall
+        if end > len(self._codes):
+            capacity = max(end, 2 * len(self._codes))
+            self._codes = np.resize(self._codes, (capacity, self.dim))
+            self._scales = np.resize(self._scales, capacity)
+            self._prefix_scales = np.resize(self._prefix_scales, capacity)
+        
+        self._codes[rows] = codes
+        self._scales[rows] = scales
+        self._prefix_scales[rows] = prefix_scales
+        self._size = end
+    
+    def clear(self):
+        """Remove all vectors."""
+        self.__init__(dim=self.dim, prefix_dim=self.prefix_dim, rerank_factor=self.rerank_factor)
+    
+    def search(self,
+               query_embeddings: np.ndarray,
+               k: int,
+               mask: Optional[np.ndarray] = None) -> Tuple[List[List[int]], List[List[float]]]:
+        """
+        Find the ``k`` most similar vectors for each query.
+        
+        Args:
+            query_embeddings: Array of shape (n_queries, dim)
+            k: Number of results per query
+            mask: Optional boolean array marking the rows that may be returned
+        
+        Returns:
+            Tuple of (rows, cosine distances), one list per query, best match first
+        """
+        queries = _l2_normalize(np.asarray(query_embeddings, dtype=np.float32))
+        size = self._size
+        k = min(k, size)
+        if k == 0:
+            return [[] for _ in queries], [[] for _ in queries]
+        
+        # First pass: prefix cosine from the int8 codes, all queries at once
+        prefixes = _l2_normalize(queries[:, :self.prefix_dim]).T
+        scores = np.empty((size, len(queries)), dtype=np.float32)
+        for start in range(0, size, self._SCAN_BLOCK):
+            stop = min(start + self._SCAN_BLOCK, size)
+            block = self._codes[start:stop, :self.prefix_dim].astype(np.float32)
+            scores[start:stop] = (block @ prefixes) * self._prefix_scales[start:stop, None]
+        
+        if mask is not None:
+            scores[~mask[:size]] = -np.inf
+        
+        n_candidates = min(k * self.rerank_factor, size)
+        candidates = np.argpartition(-scores, n_candidates - 1, axis=0)[:n_candidates]
+        
+        result_rows, result_distances = [], []
+        for q in range(len(queries)):
+            rows = candidates[:, q]
+            rows = rows[np.isfinite(scores[rows, q])]
+            
+            # Rerank the candidates with the full-dimensional inner product
+            exact = (self._codes[rows].astype(np.float32) @ queries[q]) * self._scales[rows]
+            order = np.argsort(-exact)[:k]
+            result_rows.append(rows[order].tolist())
+            result_distances.append((1.0 - exact[order]).tolist())
+        return result_rows, result_distances
+    
+    def distances(self, query_embedding: np.ndarray, rows: List[int]) -> List[float]:
+        """Cosine distances between one query and the full vectors of the given rows."""
+        query = _l2_normalize(np.asarray(query_embedding, dtype=np.float32)[None, :])[0]
+        rows = np.asarray(rows, dtype=np.intp)
+        exact = (self._codes[rows].astype(np.float32) @ query) * self._scales[rows]
+        return (1.0 - exact).tolist()
+
+
+class ArticleTable:
+    """
+    Column-oriented side table of the stored articles' fields.
+    
+    Row ``i`` describes the ``i``-th stored document, matching the rows of the
+    in-memory vector and keyword indexes. Keeping fields in parallel columns
+    lets search results be gathered by row index instead of walking per-article
+    metadata dicts, and turns category filters into one vectorized comparison.
+    """
+    
+    def __init__(self):
+        self.ids: List[str] = []
+        self.article_ids: List[str] = []
+        self.titles: List[str] = []
+        self.categories: List[str] = []
+        self.char_counts: List[int] = []
+        self._category_codes = np.empty(0, dtype=np.int32)
+        self._category_lookup: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def upsert(self, ids: List[str], metadata_list: List[Dict]) -> List[int]:
+        """
+        Store one row per document, replacing the row of an id that is already present.
+        
+        New ids get rows directly after the existing ones, so the returned rows can
+        be passed on to the vector and keyword indexes.
+        
+        Returns:
+            The row written for each id
+        """
+        size = len(self.ids)
+        columns = (self.article_ids, self.titles, self.categories, self.char_counts)
+        rows, codes = [], []
+        for id_, metadata in zip(ids, metadata_list):
+            category = metadata.get('category', 'general')
+            values = (metadata['article_id'], metadata['title'], category, metadata.get('char_count', 0))
+            row = self._rows.get(id_)
+            if row is None:
+                row = self._rows[id_] = len(self.ids)
+                self.ids.append(id_)
+                for column, value in zip(columns, values):
+                    column.append(value)
+            else:
+                for column, value in zip(columns, values):
+                    column[row] = value
+            rows.append(row)
+            codes.append(self._category_lookup.setdefault(category, len(self._category_lookup)))
+        
+        # Grow geometrically so repeated batch appends stay linear overall
+        if len(self.ids) > len(self._category_codes):
+            self._category_codes = np.resize(self._category_codes, max(len(self.ids), 2 * size))
+        self._category_codes[rows] = codes
+        return rows
+    
+    def clear(self):
+        """Remove all rows."""
+        self.__init__()
+    
+    def rows(self, ids: List[str]) -> List[int]:
+        """Map document ids to rows."""
+        return [self._rows[id_] for id_ in ids]
+    
+    def stored_rows(self, ids: List[str]) -> List[int]:
+        """Rows of whichever of ``ids`` are already stored."""
+        return [self._rows[id_] for id_ in ids if id_ in self._rows]
+    
+    def category_mask(self, category: str) -> np.ndarray:
+        """Boolean array marking the rows in ``category``."""
+        code = self._category_lookup.get(category)
+        if code is None:
+            return np.zeros(len(self.ids), dtype=bool)
+        return self._category_codes[:len(self.ids)] == code
+
+
+def _truncate_at_sentence(text: str, max_chars: int) -> str:
+    """Cut text to at most max_chars, ending on a sentence boundary when one fits."""
+    if len(text) <= max_chars:
+        return text
+    
+    end = 0
+    for sentence in _SENT_RE.finditer(text):
+        if sentence.end() > max_chars:
+            break
+        end = sentence.end()
+    return text[:end or max_chars]
+
+
+def _leading_sections(document: str, max_chars: int, n_sections: int = 2) -> str:
+    """Return the first sections of an article, cut to a sentence boundary."""
+    sections = document.split('\n## ')[:n_sections]
+    return _truncate_at_sentence("\n## ".join(sections), max_chars)
+
+
+def _tokenize(text: str) -> List[str]:
+    """Lowercase word tokens for keyword search."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """
+    Okapi BM25 keyword index over article text.
+    
+    Postings are kept per term, so documents can be added incrementally and a
+    query only touches the rows that contain one of its terms.
+    """
+    
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._doc_lens: List[int] = []
+        self._doc_terms: List[Tuple[str, ...]] = []
+        self._total_len = 0
+        self._postings: Dict[str, Dict[int, int]] = {}
+    
+    def __len__(self) -> int:
+        return len(self._doc_lens)
+    
+    def add(self, documents: List[str], rows: Optional[List[int]] = None):
+        """
+        Tokenize and store a batch of documents.
+        
+        Args:
+            documents: Document texts
+            rows: Rows to write, replacing the documents already there; rows past
+                the end must directly follow it. Defaults to appending.
+        """
+        if rows is None:
+            rows = range(len(self._doc_lens), len(self._doc_lens) + len(documents))
+        for row, document in zip(rows, documents):
+            tokens = _tokenize(document)
+            counts = Counter(tokens)
+            if row < len(self._doc_lens):
+                # Drop the replaced document's postings first
+                for term in self._doc_terms[row]:
+                    postings = self._postings[term]
+                    del postings[row]
+                    if not postings:
+                        del self._postings[term]
+                self._total_len -= self._doc_lens[row]
+                self._doc_lens[row] = len(tokens)
+                self._doc_terms[row] = tuple(counts)
+            else:
+                self._doc_lens.append(len(tokens))
+                self._doc_terms.append(tuple(counts))
+            for term, count in counts.items():
+                self._postings.setdefault(term, {})[row] = count
+            self._total_len += len(tokens)
+    
+    def clear(self):
+        """Remove all documents."""
+        self.__init__(k1=self.k1, b=self.b)
+    
+    def search(self, query: str, k: int, mask: Optional[np.ndarray] = None) -> List[int]:
+        """
+        Return the rows of the ``k`` best matching documents, best first.
+        
+        Args:
+            query: Query text
+            k: Number of results
+            mask: Optional boolean array marking the rows that may be returned
+        """
+        n_docs = len(self._doc_lens)
+        if not n_docs:
+            return []
+        avg_len = self._total_len / n_docs
+        
+        scores: Dict[int, float] = {}
+        for term in set(_tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for row, count in postings.items():
+                tf = count * (self.k1 + 1) / (
+                    count + self.k1 * (1 - self.b + self.b * self._doc_lens[row] / avg_len)
+                )
+                scores[row] = scores.get(row, 0.0) + idf * tf
+        
+        if mask is not None:
+            scores = {row: score for row, score in scores.items() if mask[row]}
+        
+        best = heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+        return [row for row, _ in best]
+
+
+def _reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[int]:
+    """Merge ranked row lists, scoring each row by the sum of 1 / (k + rank)."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row] = scores.get(row, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
 
 class SmartHelpCenter:
     """A help center system powered by Gemini embeddings and ChromaDB."""
     
-    def __init__(self, collection_name: str = "help_articles"):
+    def __init__(self,
+                 collection_name: str = "help_articles",
+                 persist_directory: Optional[str] = None,
+                 local_index: bool = True,
+                 direct_answer_threshold: float = 0.85,
+                 precompute_term_embeddings: bool = True,
+                 embedding_cache_path: Optional[str] = "./embedding_cache.sqlite3",
+                 cache_size: int = 10_000,
+                 cache_ttl: float = 3600):
         """
         Initialize the help center with Gemini embeddings and ChromaDB.
         
         Args:
             collection_name: Name for the ChromaDB collection
+            persist_directory: Where ChromaDB stores the index on disk. Defaults to
+                the CHROMA_PERSIST_DIRECTORY environment variable or ./chroma_store.
+                Searches run on in-memory indexes loaded from it at startup, so only
+                one instance should write to a given collection.
+            local_index: Search an int8 in-memory copy of the embeddings instead of
+                ChromaDB's HNSW index. It costs about 0.8 KB per article on top of
+                ChromaDB's own memory; disable it for very large collections.
+            direct_answer_threshold: Relevance score above which the top article is
+                returned directly instead of generating an answer
+            precompute_term_embeddings: Embed the query expansion terms once, on the
+                first query made only of those terms, so later such queries need no
+                embedding call
+            embedding_cache_path: SQLite file caching document embeddings by content
+                hash, so re-indexing unchanged articles skips the API. None disables it.
+            cache_size: Maximum number of cached query embeddings and responses
+            cache_ttl: Seconds before a cached query embedding or response expires
         """
         # Get API key from environment
         api_key = os.getenv("GEMINI_API_KEY")
@@ -33,37 +570,169 @@ class SmartHelpCenter:
                            "Please create a .env file with your API key.")
         
         self.client = genai.Client(api_key=api_key)
-        self.vector_db = chromadb.Client()
+        self.direct_answer_threshold = direct_answer_threshold
+        
+        # Persist the index so restarts don't have to re-embed every article
+        persist_directory = persist_directory or os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_store")
+        self.vector_db = chromadb.PersistentClient(path=persist_directory)
+        self._embedding_cache = (
+            EmbeddingCache(embedding_cache_path, dim=_EMBEDDING_DIM) if embedding_cache_path else None
+        )
         
         # Create or get collection
+        self.collection = self.vector_db.get_or_create_collection(
+            name=collection_name,
+            metadata=_COLLECTION_METADATA
+        )
+        
+        # Repeated support queries skip the embedding and generation calls
+        self._query_emb_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._response_cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        
+        self._articles = ArticleTable()
+        self._vector_index = QuantizedIndex(dim=_EMBEDDING_DIM) if local_index else None
+        self._keyword_index = BM25Index()
+        
+        # Running totals so get_statistics doesn't scan every article's metadata
+        self._category_counts: Counter = Counter()
+        self._total_chars = 0
+        self._load_local_indexes()
+        
+        # None until the first query that can use them, so construction makes no API call
+        self._term_embeddings: Optional[Dict[str, np.ndarray]] = None if precompute_term_embeddings else {}
+        self._term_embeddings_lock = threading.Lock()
+    
+    def _load_local_indexes(self, page_size: int = 1000):
+        """
+        Fill the in-memory indexes and statistics from the persisted collection.
+        
+        After this, the indexes are only updated by this instance's own writes:
+        they assume it is the collection's single writer, and changes made by
+        other processes show up after a restart.
+        """
+        self._articles.clear()
+        if self._vector_index is not None:
+            self._vector_index.clear()
+        self._keyword_index.clear()
+        self._category_counts.clear()
+        self._total_chars = 0
+        
+        include = ["documents", "metadatas"]
+        if self._vector_index is not None:
+            include.append("embeddings")
+        
+        total = self.collection.count()
+        for offset in range(0, total, page_size):
+            page = self.collection.get(include=include, limit=page_size, offset=offset)
+            if not page['ids']:
+                break
+            rows = self._articles.upsert(page['ids'], page['metadatas'])
+            if self._vector_index is not None:
+                self._vector_index.add(page['embeddings'], rows=rows)
+            self._keyword_index.add(page['documents'], rows=rows)
+            self._update_statistics(page['metadatas'])
+    
+    def _embed_expansion_terms(self) -> Dict[str, np.ndarray]:
+        """Embed every expansion term together with its synonyms in one call."""
+        terms = list(_QUERY_EXPANSIONS)
         try:
-            self.collection = self.vector_db.create_collection(
-                name=collection_name,
-                metadata={"hnsw:space": "cosine"}
+            response = self.client.models.embed_content(
+                model="gemini-embedding-001",
+                contents=[f"{term} {_QUERY_EXPANSIONS[term]}" for term in terms],
+                config=types.EmbedContentConfig(
+                    task_type="RETRIEVAL_QUERY",
+                    output_dimensionality=_EMBEDDING_DIM
+                )
             )
-        except ValueError:
-            # Collection already exists
-            self.collection = self.vector_db.get_collection(name=collection_name)
+        except Exception as e:
+            print(f"Error precomputing term embeddings: {e}")
+            return {}
+        
+        vectors = _l2_normalize(np.asarray(
+            [emb.values for emb in response.embeddings], dtype=np.float32
+        ))
+        return dict(zip(terms, vectors))
+    
+    def _synthesize_query_embedding(self, expanded_query: str, terms: List[str]) -> Optional[np.ndarray]:
+        """
+        Build a query embedding from the precomputed term embeddings.
+        
+        Only possible when the query consists of expansion terms and stopwords;
+        otherwise returns None and the query must be embedded by Gemini.
+        
+        Args:
+            expanded_query: Query as returned by ``_expand_query``
+            terms: Expansion terms matched in the query
+        """
+        if self._term_embeddings == {} or not terms:
+            return None
+        
+        remainder = expanded_query
+        for term in terms:
+            remainder = remainder.replace(_QUERY_EXPANSIONS[term], " ").replace(term, " ")
+        if any(token not in _STOPWORDS for token in _tokenize(remainder)):
+            return None
+        
+        if self._term_embeddings is None:
+            with self._term_embeddings_lock:
+                if self._term_embeddings is None:
+                    self._term_embeddings = self._embed_expansion_terms()
+        if not self._term_embeddings:
+            return None
+        
+        combined = np.sum([self._term_embeddings[term] for term in terms], axis=0)
+        return combined / max(np.linalg.norm(combined), 1e-12)
     
-    def index_help_articles(self, articles: List[Dict[str, str]], batch_size: int = 100):
+    def index_help_articles(self,
+                            articles: List[Dict[str, str]],
+                            batch_size: int = 100,
+                            max_concurrency: int = 8):
         """
         Index help articles with proper document embeddings.
         
+        Embedding requests are network-bound, so up to ``max_concurrency``
+        batches are embedded in parallel while finished batches are written
+        to ChromaDB. Set it to match your account's embedding rate limit;
+        rate-limited requests are retried with exponential backoff.
+        
+        Articles are stored under their ``article_id``, so indexing an article
+        again replaces the stored copy instead of adding a duplicate.
+        
         Args:
             articles: List of dicts with 'title', 'content', 'article_id', and optional 'category'
             batch_size: Number of articles to process at once
+            max_concurrency: Maximum number of embedding requests in flight
         """
         if not articles:
             print("No articles to index.")
             return
         
+        # Keep only the last copy of a repeated article_id, so the stored
+        # version doesn't depend on which batch finishes first
+        latest = {article['article_id']: i for i, article in enumerate(articles) if 'article_id' in article}
+        articles = [
+            article for i, article in enumerate(articles)
+            if latest.get(article.get('article_id'), i) == i
+        ]
+        
         # Process in batches for better performance
-        for i in range(0, len(articles), batch_size):
-            batch = articles[i:i + batch_size]
-            self._index_batch(batch, start_idx=i)
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            pending = [
+                executor.submit(self._embed_batch, articles[i:i + batch_size])
+                for i in range(0, len(articles), batch_size)
+            ]
+            # Store batches as they finish; every article is stored under its
+            # own id, so completion order doesn't matter
+            for future in as_completed(pending):
+                self._store_batch(future.result())
     
-    def _index_batch(self, articles: List[Dict[str, str]], start_idx: int = 0):
-        """Index a batch of articles."""
+    def _embed_batch(self, articles: List[Dict[str, str]]) -> Optional[Tuple[List[str], List[Dict], np.ndarray]]:
+        """
+        Generate document embeddings for a batch of articles.
+        
+        Returns:
+            Tuple of (documents, metadata, embeddings), or None if nothing was embedded
+        """
         documents_to_embed = []
         metadata_list = []
         
@@ -85,40 +754,90 @@ class SmartHelpCenter:
             })
         
         if not documents_to_embed:
-            return
+            return None
+        
+        embeddings = np.empty((len(documents_to_embed), _EMBEDDING_DIM), dtype=np.float32)
+        
+        # Reuse embeddings of documents whose exact text was embedded before
+        keys, cached = [], {}
+        if self._embedding_cache is not None:
+            namespace = f"gemini-embedding-001/RETRIEVAL_DOCUMENT/{_EMBEDDING_DIM}"
+            keys = [EmbeddingCache.key(document, namespace) for document in documents_to_embed]
+            cached = self._embedding_cache.get_many(keys)
+            for i, key in enumerate(keys):
+                if key in cached:
+                    embeddings[i] = cached[key]
+        misses = [i for i in range(len(documents_to_embed)) if not keys or keys[i] not in cached]
+        
+        print(f"Indexing {len(documents_to_embed)} help articles "
+              f"({len(documents_to_embed) - len(misses)} from cache)...")
+        if not misses:
+            return documents_to_embed, metadata_list, embeddings
         
         # Generate embeddings optimized for document retrieval
-        print(f"Indexing {len(documents_to_embed)} help articles...")
         try:
-            response = self.client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=documents_to_embed,
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_DOCUMENT",
-                    output_dimensionality=768
-                )
-            )
+            response = self._embed_documents([documents_to_embed[i] for i in misses])
         except Exception as e:
             print(f"Error generating embeddings: {e}")
+            return None
+        
+        # Copy each vector straight into one float32 buffer rather than building
+        # a list of Python float lists that ChromaDB would convert again
+        for i, emb in zip(misses, response.embeddings):
+            embeddings[i] = emb.values
+        
+        if self._embedding_cache is not None:
+            self._embedding_cache.set_many([(keys[i], embeddings[i]) for i in misses])
+        return documents_to_embed, metadata_list, embeddings
+    
+    def _embed_documents(self, documents: List[str], max_retries: int = 5, base_delay: float = 1.0):
+        """Embed documents, retrying with exponential backoff while rate limited (HTTP 429)."""
+        for attempt in range(max_retries + 1):
+            try:
+                return self.client.models.embed_content(
+                    model="gemini-embedding-001",
+                    contents=documents,
+                    config=types.EmbedContentConfig(
+                        task_type="RETRIEVAL_DOCUMENT",
+                        output_dimensionality=_EMBEDDING_DIM
+                    )
+                )
+            except errors.APIError as e:
+                if e.code != 429 or attempt == max_retries:
+                    raise
+                # Jitter keeps parallel batches from retrying in lockstep
+                delay = base_delay * 2 ** attempt
+                time.sleep(delay + random.uniform(0, delay))
+    
+    def _store_batch(self, batch: Optional[Tuple[List[str], List[Dict], np.ndarray]]):
+        """Store an embedded batch in the vector database, replacing articles already stored."""
+        if batch is None:
             return
         
-        # Store in vector database
-        embeddings = [emb.values for emb in response.embeddings]
-        ids = [f"doc_{start_idx + i}" for i in range(len(documents_to_embed))]
+        documents, metadata_list, embeddings = batch
+        ids = [metadata['article_id'] for metadata in metadata_list]
         
-        self.collection.add(
+        self.collection.upsert(
             embeddings=embeddings,
-            documents=documents_to_embed,
+            documents=documents,
             metadatas=metadata_list,
             ids=ids
         )
+        # Rows are replaced by id, so re-sent articles aren't mirrored twice
+        self._remove_statistics(self._articles.stored_rows(ids))
+        rows = self._articles.upsert(ids, metadata_list)
+        if self._vector_index is not None:
+            self._vector_index.add(embeddings, rows=rows)
+        self._keyword_index.add(documents, rows=rows)
+        self._update_statistics(metadata_list)
         
-        print(f"Successfully indexed {len(documents_to_embed)} articles!")
+        print(f"Successfully indexed {len(documents)} articles!")
     
     def answer_support_query(self, 
                             user_query: str, 
                             top_k: int = 3,
-                            category_filter: Optional[str] = None) -> Dict:
+                            category_filter: Optional[str] = None,
+                            search_ef: Optional[int] = None) -> Dict:
         """
         Find relevant help articles for a user's support query.
         
@@ -126,122 +845,316 @@ class SmartHelpCenter:
             user_query: The user's question
             top_k: Number of relevant articles to retrieve
             category_filter: Optional category to filter results
+            search_ef: Optional HNSW search beam width for higher-recall queries.
+                Only used with ``local_index=False``; the local index scans every article.
         
         Returns:
             Dict containing answer, relevant articles, and confidence score
         """
-        # Expand query with synonyms
-        expanded_query = self._expand_query(user_query)
+        return self.answer_support_queries(
+            [user_query],
+            top_k=top_k,
+            category_filter=category_filter,
+            search_ef=search_ef
+        )[0]
+    
+    def answer_support_queries(self,
+                               user_queries: List[str],
+                               top_k: int = 3,
+                               category_filter: Optional[str] = None,
+                               search_ef: Optional[int] = None) -> List[Dict]:
+        """
+        Answer several support queries with a single embedding call and a single vector search.
         
-        # Generate query embedding - note the different task type!
-        try:
-            query_response = self.client.models.embed_content(
-                model="gemini-embedding-001",
-                contents=[expanded_query],
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_QUERY",
-                    output_dimensionality=768
+        Args:
+            user_queries: The users' questions
+            top_k: Number of relevant articles to retrieve per query
+            category_filter: Optional category to filter results
+            search_ef: Optional HNSW search beam width for higher-recall queries.
+                Only used with ``local_index=False``; the local index scans every article.
+        
+        Returns:
+            List of result dicts (see ``answer_support_query``), one per query, in order
+        """
+        if not user_queries:
+            return []
+        
+        # Expand queries with synonyms; the matched terms are reused below
+        expansions = [self._expand_query(query) for query in user_queries]
+        expanded_queries = [expanded for expanded, _ in expansions]
+        n_candidates = max(top_k, _FUSION_CANDIDATES)
+        mask = self._articles.category_mask(category_filter) if category_filter else None
+        
+        # Keyword search needs no network call, so it runs while the queries are embedded
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            keyword_future = executor.submit(
+                lambda: [
+                    self._keyword_index.search(query, n_candidates, mask=mask)
+                    for query in expanded_queries
+                ]
+            )
+            try:
+                query_embeddings = self._embed_queries(
+                    expanded_queries,
+                    known=[self._synthesize_query_embedding(expanded, terms) for expanded, terms in expansions]
                 )
+                embed_error = None
+            except Exception as e:
+                query_embeddings, embed_error = None, e
+            keyword_rows = keyword_future.result()
+        
+        if embed_error is not None:
+            # Without query embeddings, fall back to keyword matches alone
+            if not any(keyword_rows):
+                return [{
+                    'answer': f"Error processing query: {embed_error}",
+                    'relevant_articles': [],
+                    'confidence': 'error',
+                    'generated': False
+                } for _ in user_queries]
+            ranked_rows = [rows[:top_k] for rows in keyword_rows]
+            # No query embedding, so the similarity of these matches is unknown
+            ranked_distances = [[None] * len(rows) for rows in ranked_rows]
+        else:
+            vector_rows, vector_distances = self._vector_search(
+                query_embeddings,
+                n_candidates,
+                category_filter,
+                mask,
+                search_ef
             )
-        except Exception as e:
-            return {
-                'answer': f"Error processing query: {e}",
-                'relevant_articles': [],
-                'confidence': 'error'
-            }
+            ranked_rows, ranked_distances = [], []
+            for query_embedding, rows, distances, keywords in zip(
+                query_embeddings, vector_rows, vector_distances, keyword_rows
+            ):
+                fused = _reciprocal_rank_fusion([rows, keywords])
+                # A near-perfect vector match leads even if fusion ranked it
+                # lower, so _build_answer can answer from it directly
+                if rows and 1.0 - distances[0] > self.direct_answer_threshold:
+                    fused.remove(rows[0])
+                    fused.insert(0, rows[0])
+                fused = fused[:top_k]
+                # Keyword-only hits get their own cosine from the local index;
+                # without it their similarity is unknown (None)
+                by_row = dict(zip(rows, distances))
+                keyword_only = [row for row in fused if row not in by_row]
+                if keyword_only and self._vector_index is not None:
+                    by_row.update(zip(
+                        keyword_only, self._vector_index.distances(query_embedding, keyword_only)
+                    ))
+                ranked_rows.append(fused)
+                ranked_distances.append([by_row.get(row) for row in fused])
         
-        query_embedding = query_response.embeddings[0].values
+        return [
+            self._build_answer(user_query, hits)
+            for user_query, hits in zip(user_queries, self._fetch_hits(ranked_rows, ranked_distances))
+        ]
+    
+    def _vector_search(self,
+                       query_embeddings: List[List[float]],
+                       n_results: int,
+                       category_filter: Optional[str],
+                       mask: Optional[np.ndarray],
+                       search_ef: Optional[int]) -> Tuple[List[List[int]], List[List[float]]]:
+        """Return the rows and cosine distances of the nearest articles for each query."""
+        if self._vector_index is not None and len(self._vector_index):
+            return self._vector_index.search(
+                np.asarray(query_embeddings, dtype=np.float32),
+                n_results,
+                mask=mask
+            )
         
         # Build where clause for filtering
         where_clause = {"category": category_filter} if category_filter else None
         
-        # Search for relevant articles
+        # HNSW searches with a beam of max(search_ef, n_results), so asking for
+        # more candidates widens the search for this call only, without
+        # modifying the shared collection settings
         results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k,
-            where=where_clause
+            query_embeddings=query_embeddings,
+            n_results=max(n_results, search_ef or 0),
+            where=where_clause,
+            include=["distances"]
         )
+        return (
+            [self._articles.rows(ids[:n_results]) for ids in results['ids']],
+            [distances[:n_results] for distances in results['distances']]
+        )
+    
+    def _fetch_hits(self, rows: List[List[int]], distances: List[List[Optional[float]]]) -> List[Dict]:
+        """Gather the hits' fields by row and fetch their documents in one ChromaDB call."""
+        articles = self._articles
+        unique_ids = list(dict.fromkeys(articles.ids[row] for query_rows in rows for row in query_rows))
+        fetched = self.collection.get(ids=unique_ids, include=["documents"]) if unique_ids else {
+            'ids': [], 'documents': []
+        }
+        documents = dict(zip(fetched['ids'], fetched['documents']))
+        
+        hits = []
+        for query_rows, query_distances in zip(rows, distances):
+            # Skip rows whose records are no longer in ChromaDB
+            kept = [
+                (row, distance) for row, distance in zip(query_rows, query_distances)
+                if articles.ids[row] in documents
+            ]
+            hits.append({
+                'ids': [articles.ids[row] for row, _ in kept],
+                'documents': [documents[articles.ids[row]] for row, _ in kept],
+                'titles': [articles.titles[row] for row, _ in kept],
+                'article_ids': [articles.article_ids[row] for row, _ in kept],
+                'categories': [articles.categories[row] for row, _ in kept],
+                'distances': [distance for _, distance in kept]
+            })
+        return hits
+    
+    def _embed_queries(self,
+                       expanded_queries: List[str],
+                       known: Optional[List[Optional[np.ndarray]]] = None) -> List[List[float]]:
+        """
+        Embed expanded queries, only calling Gemini for those not already cached.
         
-        if not results['ids'][0]:
+        Args:
+            expanded_queries: Queries after synonym expansion
+            known: Optional embeddings already available for some queries (None for the rest)
+        """
+        keys = [
+            hashlib.blake2b(query.encode(), digest_size=16).digest()
+            for query in expanded_queries
+        ]
+        known = known or [None] * len(expanded_queries)
+        embeddings = [
+            emb if emb is not None else self._query_emb_cache.get(key)
+            for emb, key in zip(known, keys)
+        ]
+        
+        # Deduplicate misses so each distinct query is embedded once
+        misses = list(dict.fromkeys(
+            query for query, emb in zip(expanded_queries, embeddings) if emb is None
+        ))
+        if not misses:
+            return embeddings
+        
+        # Generate query embeddings - note the different task type!
+        query_response = self.client.models.embed_content(
+            model="gemini-embedding-001",
+            contents=misses,
+            config=types.EmbedContentConfig(
+                task_type="RETRIEVAL_QUERY",
+                output_dimensionality=_EMBEDDING_DIM
+            )
+        )
+        fresh = {query: emb.values for query, emb in zip(misses, query_response.embeddings)}
+        
+        for i, (key, query) in enumerate(zip(keys, expanded_queries)):
+            if embeddings[i] is None:
+                embeddings[i] = fresh[query]
+                self._query_emb_cache.set(key, embeddings[i])
+        
+        return embeddings
+    
+    def _build_answer(self, user_query: str, hits: Dict) -> Dict:
+        """Format the search hits for a single query and generate the answer."""
+        if not hits['ids']:
             return {
                 'answer': "I couldn't find any relevant articles for your question.",
                 'relevant_articles': [],
-                'confidence': 'none'
+                'confidence': 'none',
+                'generated': False
             }
         
-        # Format the response
+        # Format the response; keyword-only matches may have no similarity score
+        scores = [None if distance is None else 1.0 - distance for distance in hits['distances']]
         relevant_articles = []
-        for i in range(len(results['ids'][0])):
+        for title, article_id, category, document, score in zip(
+            hits['titles'], hits['article_ids'], hits['categories'], hits['documents'], scores
+        ):
             relevant_articles.append({
-                'title': results['metadatas'][0][i]['title'],
-                'article_id': results['metadatas'][0][i]['article_id'],
-                'category': results['metadatas'][0][i]['category'],
-                'relevance_score': 1 - results['distances'][0][i],
-                'snippet': results['documents'][0][i][:200] + "..."
+                'title': title,
+                'article_id': article_id,
+                'category': category,
+                'relevance_score': score,
+                'snippet': document[:200] + "..."
             })
         
+        # A near-perfect match already answers the question, so skip the LLM call
+        if scores[0] is not None and scores[0] > self.direct_answer_threshold:
+            return {
+                'answer': _leading_sections(hits['documents'][0], _MAX_CONTEXT_CHARS),
+                'relevant_articles': relevant_articles,
+                'confidence': 'high',
+                'generated': False
+            }
+        
         # Generate a helpful response using the retrieved context
-        context = "\n\n---\n\n".join([doc for doc in results['documents'][0]])
+        # Each article is cut to a sentence boundary to bound the prompt size
+        context = "\n\n---\n\n".join([
+            _truncate_at_sentence(doc, _MAX_CONTEXT_CHARS) for doc in hits['documents']
+        ])
         response = self._generate_support_response(user_query, context)
         
         return {
             'answer': response,
             'relevant_articles': relevant_articles,
-            'confidence': self._calculate_confidence(results['distances'][0])
+            'confidence': self._calculate_confidence(hits['distances']),
+            'generated': True
         }
     
-    def _expand_query(self, user_query: str) -> str:
-        """Expand user query with synonyms and related terms."""
-        expansions = {
-            "can't": "cannot unable",
-            "doesn't work": "not working broken error fail",
-            "payment": "billing charge subscription invoice",
-            "login": "sign in signin authenticate",
-            "password": "credential passphrase pwd",
-            "export": "download save extract",
-            "delete": "remove erase clear",
-            "create": "make new add",
-            "update": "edit modify change"
-        }
+    def _expand_query(self, user_query: str) -> Tuple[str, List[str]]:
+        """
+        Expand user query with synonyms and related terms.
         
-        expanded = user_query.lower()
-        for term, synonyms in expansions.items():
-            if term in expanded:
-                expanded += f" {synonyms}"
+        Returns:
+            Tuple of (expanded query, matched expansion terms) so callers can reuse
+            the matches instead of scanning the query again
+        """
+        lowered = user_query.lower()
+        found = set(_EXPANSION_RE.findall(lowered))
+        if not found:
+            return lowered, []
         
-        return expanded
+        # Keep the declaration order so equal queries expand identically
+        terms = [term for term in _QUERY_EXPANSIONS if term in found]
+        return " ".join([lowered] + [_QUERY_EXPANSIONS[term] for term in terms]), terms
     
     def _generate_support_response(self, query: str, context: str) -> str:
-        """Generate a helpful response using retrieved articles as context."""
-        prompt = f"""Based on the following help articles, provide a clear and helpful answer to the user's question.
+        """
+        Generate a helpful response using retrieved articles as context.
         
-User Question: {query}
-
-Relevant Help Articles:
-{context}
-
-Instructions:
-- Provide a concise, friendly response that directly addresses the user's question
-- Use information from the articles to give specific, actionable steps
-- If the articles don't contain the exact answer, suggest related information that might help
-- Keep the tone helpful and professional
-- Format the response with clear steps if applicable"""
+        Responses are cached per (query, context digest): identical prompts produce
+        identical answers, and re-indexing an article changes the context, so its
+        old answers are never served again.
+        """
+        cache_key = (query, hashlib.blake2b(context.encode(), digest_size=16).digest())
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        prompt = "".join((_PROMPT_PREFIX, query, _PROMPT_MIDDLE, context, _PROMPT_SUFFIX))
         
         try:
             response = self.client.models.generate_content(
                 model="gemini-1.5-flash",
                 contents=prompt
             )
-            return response.text
         except Exception as e:
             return f"I found relevant articles but encountered an error generating a response: {e}"
+        
+        if response.text:
+            self._response_cache.set(cache_key, response.text)
+        return response.text
     
-    def _calculate_confidence(self, distances: List[float]) -> str:
+    def _calculate_confidence(self, distances: List[Optional[float]]) -> str:
         """Calculate confidence level based on retrieval distances."""
         if not distances:
             return "none"
         
-        avg_distance = np.mean(distances)
+        # Matches without a similarity score (keyword-only hits) can't raise confidence
+        distances = [distance for distance in distances if distance is not None]
+        if not distances:
+            return "low"
+        
+        # Plain arithmetic: top_k is small, so building an ndarray would cost more than the sum
+        avg_distance = sum(distances) / len(distances)
         if avg_distance < 0.3:
             return "high"
         elif avg_distance < 0.6:
@@ -251,50 +1164,58 @@ Instructions:
     
     def get_statistics(self) -> Dict:
         """Get statistics about the indexed articles."""
-        try:
-            # Get all documents to count
-            all_docs = self.collection.get()
-            
-            if not all_docs['metadatas']:
-                return {
-                    'total_articles': 0,
-                    'categories': {},
-                    'avg_article_length': 0
-                }
-            
-            # Count by category
-            categories = {}
-            total_chars = 0
-            
-            for metadata in all_docs['metadatas']:
-                cat = metadata.get('category', 'general')
-                categories[cat] = categories.get(cat, 0) + 1
-                total_chars += metadata.get('char_count', 0)
-            
-            return {
-                'total_articles': len(all_docs['ids']),
-                'categories': categories,
-                'avg_article_length': total_chars / len(all_docs['ids']) if all_docs['ids'] else 0
-            }
-        except Exception as e:
-            print(f"Error getting statistics: {e}")
-            return {
-                'total_articles': 0,
-                'categories': {},
-                'avg_article_length': 0
-            }
+        total_articles = sum(self._category_counts.values())
+        return {
+            'total_articles': total_articles,
+            'categories': dict(self._category_counts),
+            'avg_article_length': self._total_chars / total_articles if total_articles else 0
+        }
+    
+    def _update_statistics(self, metadata_list: List[Dict]):
+        """Add a batch of stored articles to the running statistics."""
+        self._category_counts.update(metadata.get('category', 'general') for metadata in metadata_list)
+        self._total_chars += sum(metadata.get('char_count', 0) for metadata in metadata_list)
     
-    def clear_all_articles(self):
-        """Clear all articles from the collection."""
+    def _remove_statistics(self, rows: List[int]):
+        """Take stored articles that are about to be replaced out of the running statistics."""
+        if not rows:
+            return
+        articles = self._articles
+        self._category_counts.subtract(articles.categories[row] for row in rows)
+        # Unary plus drops the categories whose count reached zero
+        self._category_counts = +self._category_counts
+        self._total_chars -= sum(articles.char_counts[row] for row in rows)
+    
+    def clear_all_articles(self, batch_size: int = 5000):
+        """
+        Clear all articles from the collection.
+        
+        Records are deleted by id in batches, so the collection itself
+        (and its HNSW configuration) is kept rather than dropped and recreated.
+        
+        Args:
+            batch_size: Number of ids to delete per request
+        """
         try:
-            self.vector_db.delete_collection(name=self.collection.name)
-            self.collection = self.vector_db.create_collection(
-                name=self.collection.name,
-                metadata={"hnsw:space": "cosine"}
-            )
+            while True:
+                # Always read from the start: deleting shifts later pages
+                ids = self.collection.get(include=[], limit=batch_size)['ids']
+                if not ids:
+                    break
+                self.collection.delete(ids=ids)
+            self._articles.clear()
+            if self._vector_index is not None:
+                self._vector_index.clear()
+            self._keyword_index.clear()
+            self._category_counts.clear()
+            self._total_chars = 0
+            self._response_cache.clear()
             print("All articles cleared successfully.")
         except Exception as e:
             print(f"Error clearing articles: {e}")
+            # Some deletes may have gone through: resync the mirrors with what is stored
+            self._load_local_indexes()
+            self._response_cache.clear()
 
 
 def smart_chunk(article: str, max_tokens: int = 500) -> List[str]:
@@ -308,32 +1229,65 @@ def smart_chunk(article: str, max_tokens: int = 500) -> List[str]:
     Returns:
         List of text chunks
     """
-    # Split by headers first
-    sections = article.split('\n## ')
+    # Rough token estimation (1 token ≈ 4 chars)
+    max_chars = max_tokens * 4
     chunks = []
     
-    for section in sections:
-        # Rough token estimation (1 token ≈ 4 chars)
-        if len(section) > max_tokens * 4:
-            # Further split long sections by paragraphs
-            paragraphs = section.split('\n\n')
-            for para in paragraphs:
-                if len(para) > max_tokens * 4:
-                    # Split very long paragraphs by sentences
-                    sentences = para.split('. ')
-                    current_chunk = ""
-                    for sentence in sentences:
-                        if len(current_chunk) + len(sentence) < max_tokens * 4:
-                            current_chunk += sentence + ". "
-                        else:
-                            if current_chunk:
-                                chunks.append(current_chunk.strip())
-                            current_chunk = sentence + ". "
-                    if current_chunk:
-                        chunks.append(current_chunk.strip())
-                else:
-                    chunks.append(para)
-        else:
+    # Split by headers first
+    for section in article.split('\n## '):
+        if len(section) <= max_chars:
             chunks.append(section)
+            continue
+        
+        # Further split long sections by paragraphs, tracking offsets only
+        for start, end in _paragraph_spans(section):
+            if end - start > max_chars:
+                # Split very long paragraphs by sentences
+                chunks.extend(_pack_sentences(section, start, end, max_chars))
+            else:
+                chunks.append(section[start:end])
     
     return [chunk for chunk in chunks if chunk.strip()]
+
+
+def _paragraph_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) offsets of the blank-line separated paragraphs in text."""
+    start = 0
+    for separator in _PARA_RE.finditer(text):
+        yield start, separator.start()
+        start = separator.end()
+    yield start, len(text)
+
+
+def _pack_sentences(text: str, start: int, end: int, max_chars: int) -> List[str]:
+    """
+    Greedily pack whole sentences of ``text[start:end]`` into chunks.
+    
+    Sentences are only located by offset; each chunk is sliced out of ``text``
+    once, when it is complete.
+    """
+    starts, ends = [], []
+    for sentence in _SENT_RE.finditer(text, start, end):
+        starts.append(sentence.start())
+        ends.append(sentence.end())
+    return [text[starts[first]:ends[last]] for first, last in _pack_spans(starts, ends, max_chars)]
+
+
+def _pack_spans(starts: List[int], ends: List[int], max_chars: int) -> List[Tuple[int, int]]:
+    """
+    Group consecutive spans into runs shorter than ``max_chars``.
+    
+    ``ends`` is increasing, so the last span that fits in a run is found by
+    binary search: the loop runs once per chunk rather than once per sentence.
+    A span longer than ``max_chars`` gets a run of its own.
+    
+    Returns:
+        (first, last) span indices of each run, inclusive
+    """
+    runs = []
+    first = 0
+    while first < len(starts):
+        last = max(first, bisect.bisect_left(ends, starts[first] + max_chars, lo=first) - 1)
+        runs.append((first, last))
+        first = last + 1
+    return runs
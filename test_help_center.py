@@ -0,0 +1,398 @@
+"""Tests for help_center."""
+
+import random
+
+import numpy as np
+
+from help_center import (
+    BM25Index,
+    EmbeddingCache,
+    QuantizedIndex,
+    TTLCache,
+    _pack_spans,
+    _leading_sections,
+    _reciprocal_rank_fusion,
+    _truncate_at_sentence,
+    smart_chunk,
+)
+
+ARTICLE = {
+    "article_id": "pwd-001",
+    "title": "Reset your password",
+    "content": "Open settings and choose reset password. We email you a reset link.",
+    "category": "account",
+}
+
+BILLING_ARTICLE = {
+    "article_id": "bill-001",
+    "title": "Update your billing details",
+    "content": "Change the card on file from the billing page.",
+    "category": "billing",
+}
+
+
+def test_smart_chunk_keeps_short_sections_whole():
+    assert smart_chunk("Intro\n## Setup\nDo it.", max_tokens=100) == ["Intro", "Setup\nDo it."]
+
+
+def test_smart_chunk_splits_long_paragraphs_at_sentence_ends():
+    paragraph = "First one. Second? Third! Fourth one here. Fifth."
+    chunks = smart_chunk(paragraph, max_tokens=7)
+
+    assert chunks == ["First one. Second? Third!", "Fourth one here. Fifth."]
+    assert all(len(chunk) < 28 for chunk in chunks)
+
+
+def test_smart_chunk_does_not_split_urls_or_version_numbers():
+    sentence = "See https://example.com/a.b for v2.1 notes."
+    chunks = smart_chunk(" ".join([sentence] * 3), max_tokens=12)
+
+    assert chunks == [sentence] * 3
+
+
+def test_smart_chunk_gives_oversized_sentences_their_own_chunk():
+    long_sentence = "A" * 50 + "."
+    chunks = smart_chunk(long_sentence + " Short one. Next.", max_tokens=5)
+
+    assert chunks == [long_sentence, "Short one. Next."]
+
+
+def test_smart_chunk_collapses_repeated_blank_lines():
+    paragraph = "word " * 3
+    chunks = smart_chunk("\n\n\n".join([paragraph] * 3), max_tokens=5)
+
+    assert chunks == [paragraph] * 3
+
+
+def test_pack_spans_runs_are_greedy_and_bounded():
+    rng = random.Random(0)
+    for _ in range(200):
+        starts, ends, position = [], [], 0
+        for _ in range(rng.randint(1, 30)):
+            position += rng.randint(0, 2)
+            starts.append(position)
+            position += rng.randint(1, 40)
+            ends.append(position)
+        max_chars = rng.randint(1, 100)
+
+        runs = _pack_spans(starts, ends, max_chars)
+
+        # Runs cover every span once, in order
+        assert [i for first, last in runs for i in range(first, last + 1)] == list(range(len(starts)))
+        for first, last in runs:
+            # Only a single oversized span may reach max_chars
+            assert first == last or ends[last] - starts[first] < max_chars
+            # The next span would not have fit
+            if last + 1 < len(starts):
+                assert ends[last + 1] - starts[first] >= max_chars
+
+
+def test_ttl_cache_evicts_least_recently_used_and_expired_entries():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+    expired = TTLCache(ttl=-1)
+    expired.set("a", 1)
+    assert expired.get("a", "missing") == "missing"
+
+
+def test_repeated_query_reuses_the_cached_answer(make_help_center, fake_models):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE])
+
+    first = center.answer_support_query("how do I reset my password")
+    second = center.answer_support_query("how do I reset my password")
+
+    assert second['answer'] == first['answer']
+    assert len(fake_models.generate_calls) == 1
+
+
+def test_reindexed_article_regenerates_the_answer(make_help_center, fake_models):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE])
+    center.answer_support_query("how do I reset my password")
+
+    center.index_help_articles([dict(ARTICLE, content="Passwords are reset by an administrator.")])
+    result = center.answer_support_query("how do I reset my password")
+
+    assert len(fake_models.generate_calls) == 2
+    assert "reset by an administrator" in fake_models.generate_calls[-1]
+    assert result['answer'] == "answer #2"
+
+
+def test_failed_clear_resyncs_local_indexes(make_help_center, monkeypatch):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, dict(ARTICLE, article_id="pwd-002")])
+    collection = center.collection
+    delete = collection.delete
+
+    def delete_one_then_fail(ids):
+        delete(ids[:1])
+        raise RuntimeError("connection lost")
+
+    monkeypatch.setattr(collection, "delete", delete_one_then_fail)
+    center.clear_all_articles()
+
+    assert len(center._articles) == len(center._vector_index) == collection.count() == 1
+    assert center.get_statistics()['total_articles'] == 1
+    assert len(center.answer_support_query("reset password")['relevant_articles']) == 1
+
+
+def test_hits_missing_from_the_collection_are_skipped(make_help_center):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, dict(ARTICLE, article_id="pwd-002")])
+    center.collection.delete(ids=["pwd-001"])
+
+    result = center.answer_support_query("reset password")
+
+    assert [article['article_id'] for article in result['relevant_articles']] == ["pwd-002"]
+
+
+def test_quantized_index_finds_nearest_vectors():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 32)).astype(np.float32)
+    index = QuantizedIndex(dim=32, prefix_dim=16)
+    index.add(vectors[:20])
+    index.add(vectors[20:])
+
+    rows, distances = index.search(vectors[[3, 40]], k=1)
+
+    assert rows == [[3], [40]]
+    assert np.allclose(distances, 0.0, atol=0.02)
+
+    unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    assert np.allclose(index.distances(vectors[3], [3, 40]), 1.0 - unit[[3, 40]] @ unit[3], atol=0.02)
+
+
+def test_quantized_index_scans_in_blocks(monkeypatch):
+    rng = np.random.default_rng(2)
+    vectors = rng.normal(size=(100, 32)).astype(np.float32)
+    index = QuantizedIndex(dim=32, prefix_dim=16, rerank_factor=100)
+    index.add(vectors)
+    expected = index.search(vectors[:5], k=10)
+
+    monkeypatch.setattr(QuantizedIndex, "_SCAN_BLOCK", 7)
+
+    assert index.search(vectors[:5], k=10) == expected
+
+
+def test_quantized_index_stores_only_int8_codes_and_scales():
+    index = QuantizedIndex(dim=768)
+    index.add(np.random.default_rng(3).normal(size=(10, 768)))
+
+    n = len(index)
+    stored = index._codes[:n].nbytes + index._scales[:n].nbytes + index._prefix_scales[:n].nbytes
+    assert index._codes.dtype == np.int8
+    assert stored == n * 776
+
+
+def test_quantized_index_replaces_rows_and_applies_mask():
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(3, 8)).astype(np.float32)
+    index = QuantizedIndex(dim=8, prefix_dim=4)
+    index.add(vectors[:2])
+    index.add(vectors[[2, 0]], rows=[2, 1])
+
+    assert len(index) == 3
+    assert index.search(vectors[[2]], k=1)[0] == [[2]]
+    assert index.search(vectors[[0]], k=1, mask=np.array([False, True, True]))[0] == [[1]]
+
+
+def test_embedding_cache_round_trips_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), dim=4)
+    key = EmbeddingCache.key("some text", namespace="model")
+    vector = np.array([0.1, 0.2, 0.3, 0.4], dtype=np.float32)
+    cache.set_many([(key, vector)])
+
+    found = cache.get_many([key, EmbeddingCache.key("some text", namespace="other")])
+
+    assert list(found) == [key]
+    assert np.array_equal(found[key], vector)
+
+
+def test_reindexing_unchanged_articles_skips_the_api(make_help_center, fake_models, tmp_path):
+    center = make_help_center(embedding_cache_path=str(tmp_path / "cache.sqlite3"))
+    center.index_help_articles([ARTICLE])
+    center.index_help_articles([ARTICLE, dict(ARTICLE, article_id="pwd-002", title="Other")])
+
+    document_calls = [contents for task, contents in fake_models.embed_calls if task == "RETRIEVAL_DOCUMENT"]
+    assert [len(contents) for contents in document_calls] == [1, 1]
+    assert center.collection.count() == 2
+
+
+def test_expand_query_appends_synonyms_in_declaration_order(make_help_center):
+    center = make_help_center()
+
+    expanded, terms = center._expand_query("Update my PASSWORD, I can't login")
+
+    assert terms == ["can't", "login", "password", "update"]
+    assert expanded == (
+        "update my password, i can't login cannot unable sign in signin authenticate "
+        "credential passphrase pwd edit modify change"
+    )
+    assert center._expand_query("Hello there") == ("hello there", [])
+
+
+def test_bm25_ranks_matching_documents_and_respects_mask():
+    index = BM25Index()
+    index.add(["reset your password", "billing and invoices", "password policy and password rules"])
+
+    assert index.search("password", k=3) == [2, 0]
+    assert index.search("password", k=3, mask=np.array([True, True, False])) == [0]
+    assert index.search("unknown", k=3) == []
+
+
+def test_bm25_replacing_a_row_drops_its_old_terms():
+    index = BM25Index()
+    index.add(["apple pie", "banana split"])
+    index.add(["cherry tart"], rows=[1])
+
+    assert len(index) == 2
+    assert index.search("banana", k=2) == []
+    assert index.search("cherry", k=2) == [1]
+
+
+def test_reciprocal_rank_fusion_rewards_rows_found_by_both_rankings():
+    assert _reciprocal_rank_fusion([[1, 2, 3], [3]]) == [3, 1, 2]
+    assert _reciprocal_rank_fusion([[], [5]]) == [5]
+
+
+def test_keyword_only_hits_get_their_own_similarity(make_help_center, monkeypatch):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+    # The vector search only finds the password article; BM25 also finds the billing one
+    monkeypatch.setattr(center, "_vector_search", lambda *args: ([[0]], [[0.25]]))
+
+    result = center.answer_support_query("billing password")
+    scores = {article['article_id']: article['relevance_score'] for article in result['relevant_articles']}
+
+    query_embedding = center._embed_queries([center._expand_query("billing password")[0]])[0]
+    assert scores["pwd-001"] == 0.75
+    assert scores["bill-001"] == 1.0 - center._vector_index.distances(query_embedding, [1])[0]
+
+
+def test_keyword_only_hits_are_unscored_without_the_local_index(make_help_center, monkeypatch):
+    center = make_help_center(local_index=False)
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+    monkeypatch.setattr(center, "_vector_search", lambda *args: ([[0]], [[0.25]]))
+
+    result = center.answer_support_query("billing password")
+
+    assert [article['relevance_score'] for article in result['relevant_articles']] == [0.75, None]
+
+
+def test_embedding_failure_falls_back_to_keyword_matches(make_help_center, fake_models):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+    fake_models.embed_error = RuntimeError("quota exceeded")
+
+    result = center.answer_support_query("billing page")
+
+    assert [article['article_id'] for article in result['relevant_articles']] == ["bill-001"]
+    assert result['relevant_articles'][0]['relevance_score'] is None
+    assert result['confidence'] == 'low'
+
+    missing = center.answer_support_query("nothing matches this")
+    assert missing['confidence'] == 'error'
+    assert missing['relevant_articles'] == []
+
+
+def test_reindexing_replaces_articles_instead_of_duplicating(make_help_center):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+
+    # Same process: the billing article moves category and changes length
+    moved = dict(BILLING_ARTICLE, category="account", content="Short.")
+    center.index_help_articles([moved])
+
+    # A restart reloads from the collection, then indexes the same articles again
+    restarted = make_help_center()
+    restarted.index_help_articles([ARTICLE, moved])
+
+    expected_chars = sum(
+        len(f"{article['title']}\n\n{article['content']}") for article in (ARTICLE, moved)
+    )
+    for instance in (center, restarted):
+        assert instance.get_statistics() == {
+            'total_articles': 2,
+            'categories': {'account': 2},
+            'avg_article_length': expected_chars / 2
+        }
+    assert restarted.collection.count() == len(restarted._articles) == len(restarted._vector_index) == 2
+
+
+def test_truncate_at_sentence_cuts_on_the_last_fitting_sentence():
+    text = "One two. Three four! Five six?"
+
+    assert _truncate_at_sentence(text, 100) == text
+    assert _truncate_at_sentence(text, 22) == "One two. Three four!"
+    assert _truncate_at_sentence(text, 5) == "One t"
+
+
+def test_leading_sections_keeps_the_first_sections():
+    document = "Title\n\nIntro text.\n## Steps\nDo this.\n## More\nIgnored."
+
+    assert _leading_sections(document, 100) == "Title\n\nIntro text.\n## Steps\nDo this."
+    assert _leading_sections(document, 20) == "Title\n\nIntro text."
+
+
+def test_near_perfect_vector_match_is_answered_directly(make_help_center, fake_models, monkeypatch):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+    # BM25 only matches the password article, so fusion ranks it first,
+    # but the billing article is a near-perfect vector match
+    monkeypatch.setattr(center, "_vector_search", lambda *args: ([[1, 0]], [[0.05, 0.5]]))
+
+    result = center.answer_support_query("reset password")
+
+    assert [article['article_id'] for article in result['relevant_articles']] == ["bill-001", "pwd-001"]
+    assert result['generated'] is False
+    assert result['confidence'] == 'high'
+    assert result['answer'].startswith(BILLING_ARTICLE['title'])
+    assert fake_models.generate_calls == []
+
+
+def test_fused_order_is_kept_below_the_direct_answer_threshold(make_help_center, fake_models, monkeypatch):
+    center = make_help_center()
+    center.index_help_articles([ARTICLE, BILLING_ARTICLE])
+    monkeypatch.setattr(center, "_vector_search", lambda *args: ([[1, 0]], [[0.2, 0.5]]))
+
+    result = center.answer_support_query("reset password")
+
+    assert [article['article_id'] for article in result['relevant_articles']] == ["pwd-001", "bill-001"]
+    assert result['generated'] is True
+    assert len(fake_models.generate_calls) == 1
+
+
+def test_term_embeddings_are_computed_lazily(make_help_center, fake_models):
+    center = make_help_center()
+    assert fake_models.embed_calls == []
+
+    # Words other than expansion terms and stopwords need a real embedding
+    expanded, terms = center._expand_query("password for the printer")
+    assert center._synthesize_query_embedding(expanded, terms) is None
+    assert fake_models.embed_calls == []
+
+    expanded, terms = center._expand_query("Login with my password please")
+    embedding = center._synthesize_query_embedding(expanded, terms)
+    assert len(fake_models.embed_calls) == 1
+
+    combined = center._term_embeddings["login"] + center._term_embeddings["password"]
+    assert np.allclose(embedding, combined / np.linalg.norm(combined))
+
+    # Later queries reuse the term embeddings
+    center._synthesize_query_embedding(*center._expand_query("password"))
+    assert len(fake_models.embed_calls) == 1
+
+
+def test_term_embeddings_can_be_disabled(make_help_center, fake_models):
+    center = make_help_center(precompute_term_embeddings=False)
+
+    assert center._synthesize_query_embedding(*center._expand_query("password")) is None
+    assert fake_models.embed_calls == []